@@ -1,9 +1,51 @@
 use chrono::{DateTime, Utc};
 use serde::{Deserialize, Serialize};
-use std::collections::HashMap;
-use std::sync::{Arc, Mutex};
+use sha2::{Digest, Sha256};
+use std::cmp::Ordering;
+use std::collections::{BTreeSet, HashMap, VecDeque};
+use std::io;
+use std::sync::{Arc, RwLock};
 use uuid::Uuid;
 use serde_json;
+use serde_json::value::RawValue;
+
+// 最近の確認済みトランザクションとして位置を保持する件数
+const RECENT_TX_CAPACITY: usize = 100_000;
+
+// 平均ブロック時間の指数移動平均の平滑化係数
+const BLOCK_TIME_EMA_ALPHA: f64 = 0.2;
+
+// 基本的なトランザクションのガス使用量
+const GAS_BASE: u64 = 21000;
+
+// データ1バイトあたりのガス使用量
+const GAS_PER_DATA_BYTE: u64 = 68;
+
+// GweiからETHへの換算
+const GWEI_PER_ETH: f64 = 1_000_000_000.0;
+
+// 難易度判定用のゼロダイジェスト
+const ZERO_DIGEST: [u8; 32] = [0; 32];
+
+// 難易度の上限（SHA-256ダイジェストの16進数桁数）
+const MAX_DIFFICULTY: u32 = 64;
+
+// チェーン検証をスレッドに分割する際の1スレッドあたりの最小ブロック数
+const MIN_BLOCKS_PER_VALIDATION_THREAD: usize = 64;
+
+// 書き込まれたバイト数のみを数えるライター
+struct ByteCounter(usize);
+
+impl io::Write for ByteCounter {
+    fn write(&mut self, buf: &[u8]) -> io::Result<usize> {
+        self.0 += buf.len();
+        Ok(buf.len())
+    }
+
+    fn flush(&mut self) -> io::Result<()> {
+        Ok(())
+    }
+}
 
 // ブロック構造体
 #[derive(Clone, Debug, Serialize, Deserialize)]
@@ -38,7 +80,7 @@ impl Block {
             hash: String::new(),
             nonce: 0,
             validator,
-            difficulty,
+            difficulty: difficulty.min(MAX_DIFFICULTY),
             size: 0,
             gas_used: 0,
             gas_limit: 10_000_000,
@@ -47,43 +89,81 @@ impl Block {
         // ガス使用量を計算
         block.gas_used = block.transactions.iter().map(|tx| tx.gas_used).sum();
 
-        // ブロックサイズを計算（シリアライズしたサイズ）
-        let serialized = serde_json::to_string(&block).unwrap_or_default();
-        block.size = serialized.len();
-
-        // ハッシュを計算
-        block.hash = block.calculate_hash();
+        // ブロックサイズを計算（シリアライズしたサイズ、文字列は生成しない）
+        let mut counter = ByteCounter(0);
+        block.size = match serde_json::to_writer(&mut counter, &block) {
+            Ok(()) => counter.0,
+            Err(_) => 0,
+        };
 
+        // ハッシュはマイニング時に設定する（マイニング前のトランザクションルート計算を省く）
         block
     }
 
-    // ブロックのハッシュを計算（簡易版）
+    // ナンス以外のヘッダーを吸収したハッシャーを作成
+    // トランザクションはダイジェストに畳み込むため、ヘッダーは固定長に近いバイト列になる
+    fn header_hasher(&self) -> Sha256 {
+        // 中間バッファを確保せず、シリアライズ結果を直接ハッシャーへ書き込む
+        let mut tx_hasher = Sha256::new();
+        serde_json::to_writer(&mut tx_hasher, &self.transactions).unwrap_or_default();
+        let tx_root = tx_hasher.finalize();
+
+        let mut hasher = Sha256::new();
+        hasher.update(self.index.to_be_bytes());
+        hasher.update(tx_root);
+        hasher.update(self.timestamp.timestamp().to_be_bytes());
+
+        // 可変長のフィールドは長さを前置し、境界をずらした同じバイト列と区別する
+        for field in [&self.previous_hash, &self.validator] {
+            hasher.update((field.len() as u64).to_be_bytes());
+            hasher.update(field.as_bytes());
+        }
+        hasher
+    }
+
+    // ブロックのハッシュを計算（SHA-256）
     pub fn calculate_hash(&self) -> String {
-        let data = format!(
-            "{}{}{}{}{}",
-            self.index,
-            self.timestamp.timestamp(),
-            serde_json::to_string(&self.transactions).unwrap_or_default(),
-            self.previous_hash,
-            self.nonce
-        );
-        
-        // 簡易ハッシュ関数（実際の実装ではSHA-256などを使用）
-        let hash_value = data.as_bytes().iter().fold(0u64, |acc, &x| acc.wrapping_add(x as u64));
-        format!("{:016x}", hash_value)
+        let mut hasher = self.header_hasher();
+        hasher.update(self.nonce.to_be_bytes());
+        hex::encode(hasher.finalize())
     }
 
     // ブロックをマイニング
     pub fn mine_block(&mut self) {
-        let target = "0".repeat(self.difficulty as usize);
-        while !self.hash.starts_with(&target) {
-            self.nonce += 1;
-            self.hash = self.calculate_hash();
-        }
+        let (nonce, digest) = mine_header(&self.header_hasher(), self.difficulty, self.nonce);
+        self.nonce = nonce;
+        self.hash = hex::encode(digest);
         println!("Block #{} mined: {}", self.index, self.hash);
     }
 }
 
+// ヘッダーを吸収済みのハッシャーから、難易度を満たすナンスとダイジェストを探索
+// sha2はSHA-NIなどのCPU拡張命令を実行時に検出して使用する
+pub fn mine_header(prefix: &Sha256, difficulty: u32, start_nonce: u64) -> (u64, [u8; 32]) {
+    // ダイジェストの桁数を超える難易度は上限に丸める
+    let difficulty = difficulty.min(MAX_DIFFICULTY);
+
+    // 16進数の先頭ゼロ桁数を、ゼロバイト数と残りの半バイトに分解
+    let full_bytes = (difficulty / 2) as usize;
+    let half = difficulty % 2 == 1;
+
+    let mut nonce = start_nonce;
+    loop {
+        // ヘッダーの吸収は呼び出し側で一度だけ行い、ナンスごとに状態を複製する
+        let mut hasher = prefix.clone();
+        hasher.update(nonce.to_be_bytes());
+        let digest: [u8; 32] = hasher.finalize().into();
+
+        // 生のダイジェストで判定し、16進文字列は採掘成功時のみ生成する
+        if digest[..full_bytes] == ZERO_DIGEST[..full_bytes]
+            && (!half || digest[full_bytes] < 0x10)
+        {
+            return (nonce, digest);
+        }
+        nonce += 1;
+    }
+}
+
 // トランザクション構造体
 #[derive(Clone, Debug, Serialize, Deserialize)]
 pub struct Transaction {
@@ -119,21 +199,21 @@ impl Transaction {
         gas_price: u64,
         gas_limit: u64,
     ) -> Self {
-        let mut gas_used = 21000; // 基本的なトランザクションのガス使用量
+        let mut gas_used = GAS_BASE;
 
         // データフィールドがある場合、追加のガスを使用
         if let Some(data_str) = &data {
-            gas_used += data_str.len() as u64 * 68;
+            gas_used += data_str.len() as u64 * GAS_PER_DATA_BYTE;
         }
 
         // 実際のガス使用量はガスリミットを超えない
         gas_used = gas_used.min(gas_limit);
 
         // 手数料を計算（gas_used * gas_price）
-        let fee = (gas_used * gas_price) as f64 / 1_000_000_000.0; // GweiからETHに変換
+        let fee = (gas_used * gas_price) as f64 / GWEI_PER_ETH;
 
         Transaction {
-            id: format!("0x{}", Uuid::new_v4().to_string().replace("-", "")),
+            id: format!("0x{}", Uuid::new_v4().simple()),
             sender,
             recipient,
             amount,
@@ -179,12 +259,79 @@ impl Account {
     }
 }
 
+// ネットワーク統計情報
+#[derive(Clone, Debug, Serialize, Deserialize)]
+pub struct NetworkStats {
+    pub block_count: usize,
+    #[serde(skip_serializing_if = "Option::is_none")]
+    pub latest_block: Option<Box<RawValue>>,
+    pub pending_transactions: usize,
+    pub average_block_time: f64,
+    pub tps: f64,
+    pub account_count: usize,
+    #[serde(skip_serializing_if = "Option::is_none")]
+    pub difficulty: Option<u32>,
+}
+
+// 残高順インデックスのキー（残高の降順、同額の場合はアドレス順）
+#[derive(Clone, Debug)]
+struct BalanceKey {
+    balance: f64,
+    address: String,
+}
+
+impl BalanceKey {
+    fn new(account: &Account) -> Self {
+        BalanceKey {
+            balance: account.balance,
+            address: account.address.clone(),
+        }
+    }
+}
+
+impl PartialEq for BalanceKey {
+    fn eq(&self, other: &Self) -> bool {
+        self.cmp(other) == Ordering::Equal
+    }
+}
+
+impl Eq for BalanceKey {}
+
+impl PartialOrd for BalanceKey {
+    fn partial_cmp(&self, other: &Self) -> Option<Ordering> {
+        Some(self.cmp(other))
+    }
+}
+
+impl Ord for BalanceKey {
+    fn cmp(&self, other: &Self) -> Ordering {
+        other
+            .balance
+            .total_cmp(&self.balance)
+            .then_with(|| self.address.cmp(&other.address))
+    }
+}
+
 // ブロックチェーン構造体
 #[derive(Clone)]
 pub struct Blockchain {
     pub chain: Vec<Block>,
     pub pending_transactions: Vec<Transaction>,
     pub accounts: HashMap<String, Account>,
+    // シリアライズ済みのブロック（マイニング後のブロックは不変）
+    block_json: Vec<Box<RawValue>>,
+    // ブロックハッシュ → チェーン上の位置
+    block_by_hash: HashMap<String, usize>,
+    // トランザクションID → (ブロック位置, ブロック内の位置)
+    tx_index: HashMap<String, (usize, usize)>,
+    // アドレス → 関連するトランザクションの位置
+    account_txs: HashMap<String, Vec<(usize, usize)>>,
+    // 最近の確認済みトランザクションの位置（新しい順）
+    recent_txs: VecDeque<(usize, usize)>,
+    // 残高の降順に並んだアカウント
+    accounts_by_balance: BTreeSet<BalanceKey>,
+    // 平均ブロック時間（秒、指数移動平均）
+    avg_block_time: Option<f64>,
 }
 
 impl Blockchain {
@@ -194,6 +341,13 @@ impl Blockchain {
             chain: Vec::new(),
             pending_transactions: Vec::new(),
             accounts: HashMap::new(),
+            block_json: Vec::new(),
+            block_by_hash: HashMap::new(),
+            tx_index: HashMap::new(),
+            account_txs: HashMap::new(),
+            recent_txs: VecDeque::new(),
+            accounts_by_balance: BTreeSet::new(),
+            avg_block_time: None,
         };
 
         // ジェネシスブロックを作成
@@ -207,17 +361,53 @@ impl Blockchain {
 
     // ジェネシスブロックを作成
     fn create_genesis_block(&mut self) {
-        let genesis_block = Block::new(
+        let mut genesis_block = Block::new(
             0,
             Vec::new(),
             "0".to_string(),
             "0x0000000000000000000000000000000000000000".to_string(),
             4,
         );
-        self.chain.push(genesis_block);
+        genesis_block.hash = genesis_block.calculate_hash();
+        self.push_block(genesis_block);
         println!("Genesis block created");
     }
 
+    // ブロックをチェーンに追加し、検索用インデックスを更新
+    fn push_block(&mut self, block: Block) {
+        let block_pos = self.chain.len();
+
+        // 平均ブロック時間を更新
+        if let Some(previous) = self.chain.last() {
+            let time_diff = (block.timestamp - previous.timestamp).num_seconds() as f64;
+            self.avg_block_time = Some(match self.avg_block_time {
+                Some(avg) => BLOCK_TIME_EMA_ALPHA * time_diff + (1.0 - BLOCK_TIME_EMA_ALPHA) * avg,
+                None => time_diff,
+            });
+        }
+
+        self.block_by_hash.insert(block.hash.clone(), block_pos);
+        self.block_json.push(
+            serde_json::value::to_raw_value(&block).expect("block serialization cannot fail"),
+        );
+
+        for (tx_pos, tx) in block.transactions.iter().enumerate() {
+            let location = (block_pos, tx_pos);
+            self.tx_index.insert(tx.id.clone(), location);
+            self.account_txs.entry(tx.sender.clone()).or_default().push(location);
+            if tx.recipient != tx.sender {
+                self.account_txs.entry(tx.recipient.clone()).or_default().push(location);
+            }
+
+            self.recent_txs.push_front(location);
+            if self.recent_txs.len() > RECENT_TX_CAPACITY {
+                self.recent_txs.pop_back();
+            }
+        }
+
+        self.chain.push(block);
+    }
+
     // 初期アカウントを作成（開発用）
     fn create_initial_accounts(&mut self) {
         let initial_accounts = vec![
@@ -239,9 +429,28 @@ impl Blockchain {
         ];
 
         for (address, private_key, balance) in initial_accounts {
-            let account = Account::new(address.clone(), private_key, balance);
-            self.accounts.insert(address, account);
+            self.insert_account(Account::new(address, private_key, balance));
+        }
+    }
+
+    // アカウントを登録し、残高順インデックスに追加
+    fn insert_account(&mut self, account: Account) {
+        let key = BalanceKey::new(&account);
+
+        // 同じアドレスのアカウントを置き換える場合は、旧残高のキーを取り除く
+        if let Some(old) = self.accounts.insert(account.address.clone(), account) {
+            self.accounts_by_balance.remove(&BalanceKey::new(&old));
         }
+        self.accounts_by_balance.insert(key);
+    }
+
+    // アカウントの残高を更新し、残高順インデックスを付け替える
+    fn update_balance(&mut self, address: &str, delta: f64) -> Option<&mut Account> {
+        let account = self.accounts.get_mut(address)?;
+        self.accounts_by_balance.remove(&BalanceKey::new(account));
+        account.balance += delta;
+        self.accounts_by_balance.insert(BalanceKey::new(account));
+        Some(account)
     }
 
     // 最新のブロックを取得
@@ -266,8 +475,7 @@ impl Blockchain {
 
         // 受信者アカウントの存在確認（存在しない場合は作成）
         if !self.accounts.contains_key(&recipient) {
-            let account = Account::new(recipient.clone(), None, 0.0);
-            self.accounts.insert(recipient.clone(), account);
+            self.insert_account(Account::new(recipient.clone(), None, 0.0));
         }
 
         // 送信者アカウントを取得
@@ -309,82 +517,122 @@ impl Blockchain {
 
     // ペンディングトランザクションをマイニング
     pub fn mine_pending_transactions(&mut self, miner_address: String) -> Option<Block> {
+        let mut new_block = self.prepare_block(miner_address)?;
+
+        // ブロックをマイニング
+        new_block.mine_block();
+
+        self.commit_block(new_block.clone()).ok()?;
+        Some(new_block)
+    }
+
+    // ペンディングトランザクションからマイニング前のブロックを作成
+    // PoWはチェーンのロック外で実行できるよう、作成・マイニング・追加を分離している
+    // 取り込んだトランザクションはcommit_blockまでペンディングに残すため、PoW中も参照でき、
+    // マイニングに失敗した場合はブロックを破棄するだけでよい
+    pub fn prepare_block(&self, miner_address: String) -> Option<Block> {
         if self.pending_transactions.is_empty() {
             println!("No transactions to mine");
             return None;
         }
 
         // マイニング報酬トランザクションを追加
-        let mut reward_tx = Transaction::new(
+        let reward_tx = Transaction::new(
             "0x0000000000000000000000000000000000000000".to_string(), // システムアドレス
             miner_address.clone(),
             5.0, // マイニング報酬
             None,
             0,
-            21000,
+            GAS_BASE,
         );
-        reward_tx.status = TransactionStatus::Confirmed;
-        self.pending_transactions.push(reward_tx);
 
         // 最新のブロックを取得
         let latest_block = self.get_latest_block().unwrap();
 
+        let index = latest_block.index + 1;
+        let previous_hash = latest_block.hash.clone();
+
+        // ブロックに取り込むトランザクションを確定させる（マイニング報酬は末尾）
+        let mut transactions = Vec::with_capacity(self.pending_transactions.len() + 1);
+        transactions.extend(self.pending_transactions.iter().cloned());
+        transactions.push(reward_tx);
+        for tx in transactions.iter_mut() {
+            tx.status = TransactionStatus::Confirmed;
+            tx.block_number = Some(index);
+        }
+
         // 新しいブロックを作成
-        let mut new_block = Block::new(
-            latest_block.index + 1,
-            self.pending_transactions.clone(),
-            latest_block.hash.clone(),
+        Some(Block::new(
+            index,
+            transactions,
+            previous_hash,
             miner_address,
             4, // 難易度
-        );
-
-        // ブロックをマイニング
-        new_block.mine_block();
+        ))
+    }
 
-        // ブロックをチェーンに追加
-        self.chain.push(new_block.clone());
+    // マイニング済みのブロックを処理してチェーンに追加
+    // 現在の先端に連結しないブロック（別のブロックが先に追加された場合など）は拒否する
+    pub fn commit_block(&mut self, new_block: Block) -> Result<(), String> {
+        let latest_block = self.get_latest_block().unwrap();
+        if new_block.index != self.chain.len() as u64 || new_block.previous_hash != latest_block.hash {
+            return Err(format!("Block #{} does not extend the current chain tip", new_block.index));
+        }
 
-        // トランザクションの処理（残高の更新など）
-        let pending_txs = self.pending_transactions.clone();
-        for tx in pending_txs {
-            self.process_transaction(&tx, new_block.index);
+        // ブロックに取り込まれたペンディングトランザクション（末尾の報酬を除く）がペンディングの先頭と一致するか確認
+        let included = new_block.transactions.len().saturating_sub(1);
+        let matches_pending = included <= self.pending_transactions.len()
+            && self.pending_transactions[..included]
+                .iter()
+                .zip(&new_block.transactions[..included])
+                .all(|(pending, tx)| pending.id == tx.id);
+        if !matches_pending {
+            return Err(format!("Block #{} does not match the pending transactions", new_block.index));
         }
 
-        // ペンディングトランザクションをクリア
-        self.pending_transactions.clear();
+        // ブロックに取り込まれたペンディングトランザクションを取り除く
+        self.pending_transactions.drain(..included);
+
+        // トランザクションの処理（残高の更新など、時刻はブロック単位で一度だけ取得）
+        let now = Utc::now();
+        for tx in &new_block.transactions {
+            self.process_transaction(tx, now);
+        }
 
         println!("Block #{} mined and added to the chain", new_block.index);
-        Some(new_block)
+
+        // ブロックをチェーンに追加
+        self.push_block(new_block);
+        Ok(())
     }
 
     // トランザクションを処理
-    fn process_transaction(&mut self, transaction: &Transaction, block_number: u64) {
+    fn process_transaction(&mut self, transaction: &Transaction, now: DateTime<Utc>) {
         // システムアドレスからの送金（マイニング報酬など）の場合は残高チェックをスキップ
         if transaction.sender != "0x0000000000000000000000000000000000000000" {
             // 送信者の残高を減少
-            if let Some(sender) = self.accounts.get_mut(&transaction.sender) {
-                sender.balance -= transaction.amount + transaction.fee;
+            let total = transaction.amount + transaction.fee;
+            if let Some(sender) = self.update_balance(&transaction.sender, -total) {
                 sender.transaction_count += 1;
-                sender.last_activity = Utc::now();
+                sender.last_activity = now;
             }
         }
 
         // 受信者の残高を増加
-        if let Some(recipient) = self.accounts.get_mut(&transaction.recipient) {
-            recipient.balance += transaction.amount;
-            recipient.last_activity = Utc::now();
+        if let Some(recipient) = self.update_balance(&transaction.recipient, transaction.amount) {
+            recipient.last_activity = now;
         } else {
             // 受信者アカウントが存在しない場合は作成
             let mut account = Account::new(transaction.recipient.clone(), None, transaction.amount);
-            account.last_activity = Utc::now();
-            self.accounts.insert(transaction.recipient.clone(), account);
+            account.last_activity = now;
+            self.insert_account(account);
         }
     }
 
     // 新しいアカウントを作成
     pub fn create_account(&mut self) -> Account {
         // アドレスと秘密鍵を生成
-        let private_key = format!("0x{}", Uuid::new_v4().to_string().replace("-", ""));
+        let private_key = format!("0x{}", Uuid::new_v4().simple());
         
         // 簡易ハッシュ関数でアドレスを生成
         let hash_value = private_key.as_bytes().iter().fold(0u64, |acc, &x| acc.wrapping_add(x as u64));
@@ -393,22 +641,30 @@ impl Blockchain {
 
         // アカウントを作成
         let account = Account::new(address.clone(), Some(private_key), 0.0);
-        self.accounts.insert(address.clone(), account.clone());
+        self.insert_account(account.clone());
 
         println!("New account created: {}", address);
         account
     }
 
+    // 残高の降順でアカウントを取得
+    pub fn get_accounts_by_balance(&self, start: usize, limit: usize) -> Vec<Account> {
+        self.accounts_by_balance
+            .iter()
+            .skip(start)
+            .take(limit)
+            .filter_map(|key| self.accounts.get(&key.address).cloned())
+            .collect()
+    }
+
     // アカウントのトランザクション履歴を取得
     pub fn get_account_transactions(&self, address: &str) -> Vec<Transaction> {
         let mut transactions = Vec::new();
 
-        // チェーン内のすべてのブロックを検索
-        for block in &self.chain {
-            for tx in &block.transactions {
-                if tx.sender == address || tx.recipient == address {
-                    transactions.push(tx.clone());
-                }
+        // インデックスから確認済みトランザクションを取得
+        if let Some(locations) = self.account_txs.get(address) {
+            for &(block_pos, tx_pos) in locations {
+                transactions.push(self.chain[block_pos].transactions[tx_pos].clone());
             }
         }
 
@@ -425,14 +681,59 @@ impl Blockchain {
         transactions
     }
 
+    // 新しい順にトランザクションを走査（ペンディング → 確認済み）
+    pub fn iter_transactions(&self, start: usize) -> impl Iterator<Item = &Transaction> + '_ {
+        let pending_len = self.pending_transactions.len();
+        let pending = self.pending_transactions.iter().rev().skip(start);
+        let confirmed_start = start.saturating_sub(pending_len);
+
+        // 保持件数内は位置のバッファから直接取得
+        let recent_len = self.recent_txs.len();
+        let recent = self
+            .recent_txs
+            .range(confirmed_start.min(recent_len)..)
+            .map(move |&(block_pos, tx_pos)| &self.chain[block_pos].transactions[tx_pos]);
+
+        // バッファからあふれた古いトランザクションはチェーンを遡って取得
+        let older_limit = if recent_len == RECENT_TX_CAPACITY { usize::MAX } else { 0 };
+        let older = self
+            .chain
+            .iter()
+            .rev()
+            .flat_map(|block| block.transactions.iter().rev())
+            .skip(recent_len.max(confirmed_start))
+            .take(older_limit);
+
+        pending.chain(recent).chain(older)
+    }
+
+    // 新しい順にトランザクションを取得
+    pub fn get_recent_transactions(&self, start: usize, limit: usize) -> Vec<Transaction> {
+        self.iter_transactions(start).take(limit).cloned().collect()
+    }
+
     // ブロック番号からブロックを取得
     pub fn get_block_by_number(&self, number: u64) -> Option<&Block> {
         self.chain.iter().find(|block| block.index == number)
     }
 
+    // ブロック番号からシリアライズ済みのブロックを取得
+    pub fn get_block_json(&self, number: u64) -> Option<&RawValue> {
+        self.block_json.get(number as usize).map(|json| json.as_ref())
+    }
+
+    // ハッシュからシリアライズ済みのブロックを取得
+    pub fn get_block_json_by_hash(&self, block_hash: &str) -> Option<&RawValue> {
+        self.block_by_hash
+            .get(block_hash)
+            .map(|&block_pos| self.block_json[block_pos].as_ref())
+    }
+
     // ハッシュからブロックを取得
     pub fn get_block_by_hash(&self, block_hash: &str) -> Option<&Block> {
-        self.chain.iter().find(|block| block.hash == block_hash)
+        self.block_by_hash
+            .get(block_hash)
+            .map(|&block_pos| &self.chain[block_pos])
     }
 
     // トランザクションIDからトランザクションを取得
@@ -444,65 +745,49 @@ impl Blockchain {
             }
         }
 
-        // チェーン内のすべてのブロックを検索
-        for block in &self.chain {
-            for tx in &block.transactions {
-                if tx.id == tx_id {
-                    let mut tx_clone = tx.clone();
-                    tx_clone.block_number = Some(block.index);
-                    return Some(tx_clone);
-                }
-            }
-        }
-
-        None
+        // インデックスから確認済みトランザクションを検索
+        let &(block_pos, tx_pos) = self.tx_index.get(tx_id)?;
+        Some(self.chain[block_pos].transactions[tx_pos].clone())
     }
 
-    // ネットワーク統計情報を取得
-    pub fn get_network_stats(&self) -> HashMap<String, serde_json::Value> {
-        let mut stats = HashMap::new();
-
-        // ブロック数
-        stats.insert(
-            "block_count".to_string(),
-            serde_json::Value::Number(serde_json::Number::from(self.chain.len())),
-        );
-
-        // 最新ブロック
-        if let Some(latest_block) = self.get_latest_block() {
-            stats.insert(
-                "latest_block".to_string(),
-                serde_json::to_value(latest_block).unwrap_or(serde_json::Value::Null),
-            );
+    // チェーンの整合性を検証
+    pub fn is_chain_valid(&self) -> bool {
+        // 前ブロックとの連結を確認
+        if !self.chain.windows(2).all(|pair| pair[1].previous_hash == pair[0].hash) {
+            return false;
         }
 
-        // ペンディングトランザクション数
-        stats.insert(
-            "pending_transactions".to_string(),
-            serde_json::Value::Number(serde_json::Number::from(self.pending_transactions.len())),
-        );
+        // ハッシュの再計算はブロックごとに独立しているため、スレッドに分割して検証
+        let blocks = self.chain.get(1..).unwrap_or_default();
+        let threads = std::thread::available_parallelism().map(|n| n.get()).unwrap_or(1);
 
-        // 平均ブロック時間を計算
-        let mut block_times = Vec::new();
-        for i in 1..self.chain.len() {
-            let time_diff = (self.chain[i].timestamp - self.chain[i - 1].timestamp).num_seconds();
-            block_times.push(time_diff as f64);
+        // スレッド起動のコストに見合わない短いチェーンは逐次に検証する
+        if blocks.len() < threads * MIN_BLOCKS_PER_VALIDATION_THREAD {
+            return blocks.iter().all(|block| block.hash == block.calculate_hash());
         }
+        let chunk_size = blocks.len().div_ceil(threads);
+
+        std::thread::scope(|scope| {
+            let handles: Vec<_> = blocks
+                .chunks(chunk_size)
+                .map(|chunk| {
+                    scope.spawn(move || chunk.iter().all(|block| block.hash == block.calculate_hash()))
+                })
+                .collect();
+
+            handles.into_iter().all(|handle| handle.join().unwrap_or(false))
+        })
+    }
 
-        let avg_block_time = if !block_times.is_empty() {
-            block_times.iter().sum::<f64>() / block_times.len() as f64
-        } else {
-            0.0
-        };
+    // ネットワーク統計情報を取得
+    pub fn get_network_stats(&self) -> NetworkStats {
+        let latest_block = self.get_latest_block();
 
-        stats.insert(
-            "average_block_time".to_string(),
-            serde_json::Value::Number(serde_json::Number::from_f64(avg_block_time).unwrap_or(serde_json::Number::from(0))),
-        );
+        // 平均ブロック時間はブロック追加時に更新済み
+        let avg_block_time = self.avg_block_time.unwrap_or(0.0);
 
         // TPS（1秒あたりのトランザクション数）を計算
-        let latest_tx_count = self
-            .get_latest_block()
+        let latest_tx_count = latest_block
             .map(|block| block.transactions.len())
             .unwrap_or(0);
 
@@ -512,42 +797,245 @@ impl Blockchain {
             0.0
         };
 
-        stats.insert(
-            "tps".to_string(),
-            serde_json::Value::Number(serde_json::Number::from_f64(tps).unwrap_or(serde_json::Number::from(0))),
-        );
-
-        // アカウント数
-        stats.insert(
-            "account_count".to_string(),
-            serde_json::Value::Number(serde_json::Number::from(self.accounts.len())),
-        );
-
-        // 難易度
-        if let Some(latest_block) = self.get_latest_block() {
-            stats.insert(
-                "difficulty".to_string(),
-                serde_json::Value::Number(serde_json::Number::from(latest_block.difficulty)),
-            );
+        NetworkStats {
+            block_count: self.chain.len(),
+            latest_block: self.block_json.last().cloned(),
+            pending_transactions: self.pending_transactions.len(),
+            average_block_time: avg_block_time,
+            tps,
+            account_count: self.accounts.len(),
+            difficulty: latest_block.map(|block| block.difficulty),
         }
-
-        stats
     }
 }
 
 // スレッドセーフなブロックチェーンシングルトン
+// 読み取りは並行に実行し、書き込み（トランザクション追加・ブロック追加）のみ排他にする
 pub struct BlockchainState {
-    pub blockchain: Arc<Mutex<Blockchain>>,
+    pub blockchain: Arc<RwLock<Blockchain>>,
+    // トランザクション追加からブロック追加までを直列化するロック（PoW中もチェーンのロックは保持しない）
+    pub mining: Arc<tokio::sync::Mutex<()>>,
 }
 
 impl BlockchainState {
     pub fn new() -> Self {
         BlockchainState {
-            blockchain: Arc::new(Mutex::new(Blockchain::new())),
+            blockchain: Arc::new(RwLock::new(Blockchain::new())),
+            mining: Arc::new(tokio::sync::Mutex::new(())),
         }
     }
 
     pub fn get_instance() -> Self {
         Self::new()
     }
-}
\ No newline at end of file
+}
+
+#[cfg(test)]
+mod tests {
+    use super::*;
+
+    #[test]
+    fn test_mine_block() {
+        let tx = Transaction::new(
+            "0x1234567890abcdef1234567890abcdef12345678".to_string(),
+            "0xabcdef1234567890abcdef1234567890abcdef12".to_string(),
+            10.0,
+            None,
+            5,
+            21000,
+        );
+        let mut block = Block::new(1, vec![tx], "0".to_string(), "miner".to_string(), 2);
+
+        // マイニング
+        block.mine_block();
+
+        assert!(block.hash.starts_with("00"));
+        assert_eq!(block.hash, block.calculate_hash());
+
+        // 可変長フィールドの境界をずらしてもハッシュは一致しない
+        let mut shifted = block.clone();
+        shifted.previous_hash = "0m".to_string();
+        shifted.validator = "iner".to_string();
+        assert_ne!(shifted.calculate_hash(), block.calculate_hash());
+
+        // 奇数の難易度は半バイト単位で判定される
+        let mut block = Block::new(1, Vec::new(), "0".to_string(), "miner".to_string(), 3);
+        block.mine_block();
+        assert!(block.hash.starts_with("000"));
+        assert_eq!(block.hash, block.calculate_hash());
+
+        // ダイジェストの桁数を超える難易度は上限に丸められる
+        let block = Block::new(2, Vec::new(), "0".to_string(), "miner".to_string(), 1000);
+        assert_eq!(block.difficulty, MAX_DIFFICULTY);
+
+        // サイズはハッシュ未設定時のシリアライズ結果と一致する
+        let mut unhashed = block.clone();
+        unhashed.hash = String::new();
+        unhashed.nonce = 0;
+        unhashed.size = 0;
+        assert_eq!(block.size, serde_json::to_string(&unhashed).unwrap().len());
+    }
+
+    #[test]
+    fn test_indexed_lookups() {
+        let mut blockchain = Blockchain::new();
+        let sender = "0x1234567890abcdef1234567890abcdef12345678".to_string();
+        let recipient = "0xabcdef1234567890abcdef1234567890abcdef12".to_string();
+
+        // トランザクションを追加してマイニング
+        let tx_id = blockchain
+            .add_transaction(sender.clone(), recipient.clone(), 10.0, None, 5, 21000)
+            .unwrap();
+        let block = blockchain.mine_pending_transactions(sender.clone()).unwrap();
+
+        // ハッシュからブロックを取得
+        let found = blockchain.get_block_by_hash(&block.hash).unwrap();
+        assert_eq!(found.index, block.index);
+
+        // IDからトランザクションを取得
+        let tx = blockchain.get_transaction(&tx_id).unwrap();
+        assert_eq!(tx.status, TransactionStatus::Confirmed);
+        assert_eq!(tx.block_number, Some(block.index));
+
+        // アカウントのトランザクション履歴を取得
+        let history = blockchain.get_account_transactions(&recipient);
+        assert_eq!(history.len(), 1);
+        assert_eq!(history[0].id, tx_id);
+
+        // シリアライズ済みのブロックを取得
+        let json = blockchain.get_block_json(block.index).unwrap();
+        let cached: Block = serde_json::from_str(json.get()).unwrap();
+        assert_eq!(cached.hash, block.hash);
+        let json = blockchain.get_block_json_by_hash(&block.hash).unwrap();
+        assert_eq!(json.get(), blockchain.get_block_json(block.index).unwrap().get());
+
+        // 最近のトランザクションは新しい順（報酬トランザクション → 送金）
+        let recent = blockchain.get_recent_transactions(0, 10);
+        assert_eq!(recent.len(), 2);
+        assert_eq!(recent[1].id, tx_id);
+        assert_eq!(blockchain.get_recent_transactions(1, 10)[0].id, tx_id);
+    }
+
+    #[test]
+    fn test_prepare_block_keeps_pending() {
+        let mut blockchain = Blockchain::new();
+        let sender = "0x1234567890abcdef1234567890abcdef12345678".to_string();
+        let recipient = "0xabcdef1234567890abcdef1234567890abcdef12".to_string();
+
+        let tx_id = blockchain
+            .add_transaction(sender.clone(), recipient.clone(), 10.0, None, 5, 21000)
+            .unwrap();
+
+        // マイニング中もトランザクションはペンディングとして参照できる
+        let block = blockchain.prepare_block(sender.clone()).unwrap();
+        let tx = blockchain.get_transaction(&tx_id).unwrap();
+        assert_eq!(tx.status, TransactionStatus::Pending);
+        assert_eq!(tx.block_number, None);
+
+        // マイニングに失敗してブロックを破棄しても失われない
+        drop(block);
+        assert_eq!(blockchain.pending_transactions.len(), 1);
+
+        // ブロックの追加後はペンディングから取り除かれる
+        let mut block = blockchain.prepare_block(sender.clone()).unwrap();
+        let later_id = blockchain
+            .add_transaction(sender.clone(), recipient, 1.0, None, 5, 21000)
+            .unwrap();
+        block.mine_block();
+        blockchain.commit_block(block).unwrap();
+        assert_eq!(blockchain.pending_transactions.len(), 1);
+        assert_eq!(blockchain.pending_transactions[0].id, later_id);
+        assert_eq!(blockchain.get_transaction(&tx_id).unwrap().status, TransactionStatus::Confirmed);
+    }
+
+    #[test]
+    fn test_commit_stale_block() {
+        let mut blockchain = Blockchain::new();
+        let sender = "0x1234567890abcdef1234567890abcdef12345678".to_string();
+        let recipient = "0xabcdef1234567890abcdef1234567890abcdef12".to_string();
+
+        blockchain
+            .add_transaction(sender.clone(), recipient.clone(), 1.0, None, 5, 21000)
+            .unwrap();
+
+        // 同じ先端から2つのブロックを作成
+        let mut first = blockchain.prepare_block(sender.clone()).unwrap();
+        let mut stale = blockchain.prepare_block(sender.clone()).unwrap();
+        first.mine_block();
+        stale.mine_block();
+
+        blockchain.commit_block(first).unwrap();
+        let balance = blockchain.accounts[&recipient].balance;
+
+        // 先に追加されたブロックと同じ先端を参照するブロックは拒否される
+        assert!(blockchain.commit_block(stale).is_err());
+        assert_eq!(blockchain.chain.len(), 2);
+        assert_eq!(blockchain.accounts[&recipient].balance, balance);
+        assert!(blockchain.is_chain_valid());
+
+        // ペンディングの先頭と一致しないブロックも拒否される
+        blockchain
+            .add_transaction(sender.clone(), recipient.clone(), 1.0, None, 5, 21000)
+            .unwrap();
+        let mut block = blockchain.prepare_block(sender.clone()).unwrap();
+        block.transactions[0].id = "unknown".to_string();
+        block.mine_block();
+        assert!(blockchain.commit_block(block).is_err());
+        assert_eq!(blockchain.pending_transactions.len(), 1);
+    }
+
+    #[test]
+    fn test_chain_validation() {
+        let mut blockchain = Blockchain::new();
+        let sender = "0x1234567890abcdef1234567890abcdef12345678".to_string();
+        let recipient = "0xabcdef1234567890abcdef1234567890abcdef12".to_string();
+
+        for _ in 0..2 {
+            blockchain
+                .add_transaction(sender.clone(), recipient.clone(), 1.0, None, 5, 21000)
+                .unwrap();
+            blockchain.mine_pending_transactions(sender.clone()).unwrap();
+        }
+        assert!(blockchain.is_chain_valid());
+
+        // 確定済みトランザクションを改ざんすると検証に失敗する
+        blockchain.chain[1].transactions[0].amount = 1_000.0;
+        assert!(!blockchain.is_chain_valid());
+    }
+
+    #[test]
+    fn test_accounts_by_balance() {
+        let mut blockchain = Blockchain::new();
+
+        // 初期アカウントは残高の降順で並ぶ
+        let accounts = blockchain.get_accounts_by_balance(0, 10);
+        let balances: Vec<f64> = accounts.iter().map(|a| a.balance).collect();
+        assert_eq!(balances, vec![1_000_000.0, 750_000.0, 500_000.0]);
+
+        // 送金後も順序が維持される
+        let sender = "0x1234567890abcdef1234567890abcdef12345678".to_string();
+        let recipient = "0xabcdef1234567890abcdef1234567890abcdef12".to_string();
+        blockchain
+            .add_transaction(sender.clone(), recipient.clone(), 400_000.0, None, 5, 21000)
+            .unwrap();
+        blockchain.mine_pending_transactions(sender).unwrap();
+
+        let top = blockchain.get_accounts_by_balance(0, 1);
+        assert_eq!(top[0].address, recipient);
+        assert_eq!(blockchain.get_accounts_by_balance(1, 10).len(), 2);
+    }
+
+    #[test]
+    fn test_accounts_by_balance_overwrite() {
+        let mut blockchain = Blockchain::new();
+        let address = "0x9876543210fedcba9876543210fedcba98765432".to_string();
+
+        // 既存アドレスのアカウントを置き換えても重複しない
+        blockchain.insert_account(Account::new(address.clone(), None, 0.0));
+
+        let accounts = blockchain.get_accounts_by_balance(0, usize::MAX);
+        assert_eq!(accounts.len(), blockchain.accounts.len());
+        assert_eq!(accounts.iter().filter(|a| a.address == address).count(), 1);
+        assert_eq!(accounts.last().unwrap().address, address);
+    }
+}
@@ -1,22 +1,28 @@
 use axum::{
     extract::{Path, Query, State},
-    http::StatusCode,
+    http::{header, StatusCode},
     response::IntoResponse,
     routing::{get, get_service, post},
     Json, Router,
 };
 use serde::{Deserialize, Serialize};
-use std::collections::HashMap;
+use serde_json::value::RawValue;
+use std::collections::{BTreeMap, HashMap};
 use std::net::SocketAddr;
 use std::path::PathBuf;
 use std::sync::{Arc, Mutex};
+use tower_http::compression::{
+    predicate::{DefaultPredicate, Predicate, SizeAbove},
+    CompressionLayer,
+};
 use tower_http::cors::CorsLayer;
 use tower_http::services::ServeDir;
 use tower_http::trace::TraceLayer;
+use tower_http::CompressionLevel;
 use tracing::info;
 use serde_json;
 
-use crate::blockchain::{BlockchainState, Transaction};
+use crate::blockchain::{BlockchainState, NetworkStats, Transaction, TransactionStatus};
 
 // トランザクション作成リクエスト
 #[derive(Debug, Serialize, Deserialize)]
@@ -66,15 +72,74 @@ impl<T> ApiResponse<T> {
     }
 }
 
+// シリアライズ済みトランザクションのキャッシュの最大件数
+const TX_CACHE_CAPACITY: usize = 4096;
+
+// 確認済みトランザクションのシリアライズ結果を保持するLRUキャッシュ
+// 確認済みトランザクションは不変のため、無効化は不要
+#[derive(Default)]
+pub struct TxJsonCache {
+    entries: HashMap<String, (u64, Box<RawValue>)>,
+    // 最終参照順（古い順）
+    order: BTreeMap<u64, String>,
+    tick: u64,
+}
+
+impl TxJsonCache {
+    fn get(&mut self, tx_id: &str) -> Option<&RawValue> {
+        self.tick += 1;
+        let (stamp, json) = self.entries.get_mut(tx_id)?;
+        if let Some(id) = self.order.remove(stamp) {
+            self.order.insert(self.tick, id);
+        }
+        *stamp = self.tick;
+        Some(json)
+    }
+
+    fn insert(&mut self, tx_id: String, json: Box<RawValue>) {
+        self.tick += 1;
+        self.order.insert(self.tick, tx_id.clone());
+        if let Some((stamp, _)) = self.entries.insert(tx_id, (self.tick, json)) {
+            self.order.remove(&stamp);
+        }
+
+        // 上限を超えた場合は最も参照の古いものから破棄
+        while self.entries.len() > TX_CACHE_CAPACITY {
+            match self.order.pop_first() {
+                Some((_, oldest)) => {
+                    self.entries.remove(&oldest);
+                }
+                None => break,
+            }
+        }
+    }
+}
+
 // アプリケーション状態
+// 読み取りAPIが並行して動けるよう、状態全体ではなく各フィールド単位でロックする
 pub struct AppState {
     pub blockchain_state: BlockchainState,
+    pub tx_cache: Mutex<TxJsonCache>,
+}
+
+// APIレスポンスをJSONバイト列として返す（シリアライズ済みの値をそのまま埋め込む場合に使用）
+fn raw_json_response<T: Serialize>(status: StatusCode, body: &ApiResponse<T>) -> Response {
+    match serde_json::to_vec(body) {
+        Ok(bytes) => (
+            status,
+            [(header::CONTENT_TYPE, "application/json")],
+            bytes,
+        ).into_response(),
+        Err(err) => (
+            StatusCode::INTERNAL_SERVER_ERROR,
+            Json(ApiResponse::<()>::error(err.to_string())),
+        ).into_response(),
+    }
 }
 
 // ハンドラー関数
-async fn get_status(State(state): State<Arc<Mutex<AppState>>>) -> (StatusCode, Json<ApiResponse<HashMap<String, serde_json::Value>>>) {
-    let app_state = state.lock().unwrap();
-    let blockchain = app_state.blockchain_state.blockchain.lock().unwrap();
+async fn get_status(State(state): State<Arc<AppState>>) -> (StatusCode, Json<ApiResponse<NetworkStats>>) {
+    let blockchain = state.blockchain_state.blockchain.read().unwrap();
     
     let stats = blockchain.get_network_stats();
     
@@ -82,55 +147,69 @@ async fn get_status(State(state): State<Arc<Mutex<AppState>>>) -> (StatusCode, J
 }
 
 async fn get_block(
-    State(state): State<Arc<Mutex<AppState>>>,
+    State(state): State<Arc<AppState>>,
     Path(block_id): Path<String>,
-) -> (StatusCode, Json<ApiResponse<crate::blockchain::Block>>) {
-    let app_state = state.lock().unwrap();
-    let blockchain = app_state.blockchain_state.blockchain.lock().unwrap();
+) -> Response {
+    let blockchain = state.blockchain_state.blockchain.read().unwrap();
     
+    // マイニング済みのブロックはシリアライズ済みの値を返す
     let block = if let Ok(number) = block_id.parse::<u64>() {
-        blockchain.get_block_by_number(number).cloned()
+        blockchain.get_block_json(number)
     } else {
-        blockchain.get_block_by_hash(&block_id).cloned()
+        blockchain.get_block_json_by_hash(&block_id)
     };
     
     match block {
-        Some(block) => (StatusCode::OK, Json(ApiResponse::success(block))),
+        Some(block) => raw_json_response(StatusCode::OK, &ApiResponse::success(block)),
         None => (
             StatusCode::NOT_FOUND,
             Json(ApiResponse::<crate::blockchain::Block>::error(format!(
                 "Block {} not found",
                 block_id
             ))),
-        ),
+        ).into_response(),
     }
 }
 
 async fn get_transaction(
-    State(state): State<Arc<Mutex<AppState>>>,
+    State(state): State<Arc<AppState>>,
     Path(tx_id): Path<String>,
-) -> (StatusCode, Json<ApiResponse<Transaction>>) {
-    let app_state = state.lock().unwrap();
-    let blockchain = app_state.blockchain_state.blockchain.lock().unwrap();
+) -> Response {
+    // キャッシュ済みの確認済みトランザクション（ロックは複製の間だけ保持する）
+    let cached = state.tx_cache.lock().unwrap().get(&tx_id).map(|json| json.to_owned());
+    if let Some(json) = cached {
+        return raw_json_response(StatusCode::OK, &ApiResponse::success(json));
+    }
+    
+    let blockchain = state.blockchain_state.blockchain.read().unwrap();
     
     match blockchain.get_transaction(&tx_id) {
-        Some(tx) => (StatusCode::OK, Json(ApiResponse::success(tx))),
+        Some(tx) => {
+            // ペンディング中のトランザクションは状態が変わるためキャッシュしない
+            if tx.status == TransactionStatus::Confirmed {
+                if let Ok(json) = serde_json::value::to_raw_value(&tx) {
+                    // シリアライズは一度だけ行い、同じ結果をレスポンスにも使う
+                    state.tx_cache.lock().unwrap().insert(tx_id, json.clone());
+                    return raw_json_response(StatusCode::OK, &ApiResponse::success(json));
+                }
+            }
+            (StatusCode::OK, Json(ApiResponse::success(tx))).into_response()
+        }
         None => (
             StatusCode::NOT_FOUND,
             Json(ApiResponse::<Transaction>::error(format!(
                 "Transaction {} not found",
                 tx_id
             ))),
-        ),
+        ).into_response(),
     }
 }
 
 async fn get_account(
-    State(state): State<Arc<Mutex<AppState>>>,
+    State(state): State<Arc<AppState>>,
     Path(address): Path<String>,
 ) -> (StatusCode, Json<ApiResponse<crate::blockchain::Account>>) {
-    let app_state = state.lock().unwrap();
-    let blockchain = app_state.blockchain_state.blockchain.lock().unwrap();
+    let blockchain = state.blockchain_state.blockchain.read().unwrap();
     
     match blockchain.accounts.get(&address) {
         Some(account) => (StatusCode::OK, Json(ApiResponse::success(account.clone()))),
@@ -145,13 +224,16 @@ async fn get_account(
 }
 
 async fn create_transaction(
-    State(state): State<Arc<Mutex<AppState>>>,
+    State(state): State<Arc<AppState>>,
     Json(request): Json<CreateTransactionRequest>,
 ) -> (StatusCode, Json<ApiResponse<String>>) {
-    let app_state = state.lock().unwrap();
-    let mut blockchain = app_state.blockchain_state.blockchain.lock().unwrap();
+    let blockchain = &state.blockchain_state.blockchain;
+    
+    // 残高チェックからブロック追加までを直列化する
+    // （マイニング中の送金が未反映の残高で検証されて二重に受理されるのを防ぐ。読み取りAPIは止めない）
+    let _mining = state.blockchain_state.mining.lock().await;
     
-    let result = blockchain.add_transaction(
+    let result = blockchain.write().unwrap().add_transaction(
         request.from.clone(),
         request.to.clone(),
         request.amount,
@@ -163,8 +245,28 @@ async fn create_transaction(
     match result {
         Ok(tx_id) => {
             // 自動マイニング（開発用）
-            if !blockchain.pending_transactions.is_empty() {
-                blockchain.mine_pending_transactions(request.from.clone());
+            let block = blockchain.read().unwrap().prepare_block(request.from.clone());
+            
+            if let Some(mut block) = block {
+                // PoWはブロッキングスレッドで実行し、その間も読み取りAPIを止めない
+                let mined = tokio::task::spawn_blocking(move || {
+                    block.mine_block();
+                    block
+                })
+                .await;
+                
+                let committed = match mined {
+                    Ok(block) => blockchain.write().unwrap().commit_block(block),
+                    Err(err) => Err(err.to_string()),
+                };
+                
+                if let Err(err) = committed {
+                    // トランザクションはペンディングに残っているので、次のブロックで取り込まれる
+                    return (
+                        StatusCode::INTERNAL_SERVER_ERROR,
+                        Json(ApiResponse::<String>::error(format!("Mining failed: {}", err))),
+                    );
+                }
             }
             
             (StatusCode::CREATED, Json(ApiResponse::success(tx_id)))
@@ -184,81 +286,64 @@ pub struct ListBlocksQuery {
 }
 
 async fn list_blocks(
-    State(state): State<Arc<Mutex<AppState>>>,
+    State(state): State<Arc<AppState>>,
     Query(params): Query<ListBlocksQuery>,
-) -> (StatusCode, Json<ApiResponse<Vec<crate::blockchain::Block>>>) {
-    let app_state = state.lock().unwrap();
-    let blockchain = app_state.blockchain_state.blockchain.lock().unwrap();
+) -> impl IntoResponse {
+    let blockchain = state.blockchain_state.blockchain.read().unwrap();
     
-    let blocks = &blockchain.chain;
-    let latest_height = blocks.len() as u64 - 1;
+    let latest_height = blockchain.chain.len() as u64 - 1;
     let start = params.start.unwrap_or(latest_height);
     let limit = params.limit.unwrap_or(10).min(100); // 最大100ブロック
     
+    // シリアライズ済みのブロックをそのまま連結する
     let mut result = Vec::new();
     
     for i in (0..=start.min(latest_height)).rev().take(limit as usize) {
-        if let Some(block) = blocks.get(i as usize) {
-            result.push(block.clone());
+        if let Some(block) = blockchain.get_block_json(i) {
+            result.push(block);
         }
     }
     
-    (StatusCode::OK, Json(ApiResponse::success(result)))
+    raw_json_response(StatusCode::OK, &ApiResponse::success(result))
 }
 
 async fn list_transactions(
-    State(state): State<Arc<Mutex<AppState>>>,
+    State(state): State<Arc<AppState>>,
     Query(params): Query<ListBlocksQuery>,
-) -> (StatusCode, Json<ApiResponse<Vec<Transaction>>>) {
-    let app_state = state.lock().unwrap();
-    let blockchain = app_state.blockchain_state.blockchain.lock().unwrap();
-    
-    // すべてのトランザクションを収集
-    let mut all_transactions = Vec::new();
-    
-    // ペンディングトランザクション
-    for tx in &blockchain.pending_transactions {
-        all_transactions.push(tx.clone());
-    }
-    
-    // 確認済みトランザクション
-    for block in &blockchain.chain {
-        for tx in &block.transactions {
-            all_transactions.push(tx.clone());
-        }
-    }
-    
-    // タイムスタンプの降順でソート
-    all_transactions.sort_by(|a, b| b.timestamp.cmp(&a.timestamp));
+) -> Response {
+    let blockchain = state.blockchain_state.blockchain.read().unwrap();
     
     let limit = params.limit.unwrap_or(10).min(100); // 最大100トランザクション
     let start = params.start.unwrap_or(0);
     
-    let result = all_transactions
-        .into_iter()
-        .skip(start as usize)
+    // 新しい順に必要な件数だけ、複製せずに参照のまま直接シリアライズする
+    let result: Vec<&Transaction> = blockchain
+        .iter_transactions(start as usize)
         .take(limit as usize)
-        .collect::<Vec<_>>();
+        .collect();
     
-    (StatusCode::OK, Json(ApiResponse::success(result)))
+    raw_json_response(StatusCode::OK, &ApiResponse::success(result))
 }
 
 async fn list_accounts(
-    State(state): State<Arc<Mutex<AppState>>>,
+    State(state): State<Arc<AppState>>,
+    Query(params): Query<ListBlocksQuery>,
 ) -> (StatusCode, Json<ApiResponse<Vec<crate::blockchain::Account>>>) {
-    let app_state = state.lock().unwrap();
-    let blockchain = app_state.blockchain_state.blockchain.lock().unwrap();
+    let blockchain = state.blockchain_state.blockchain.read().unwrap();
+    
+    let limit = params.limit.unwrap_or(10).min(100); // 最大100アカウント
+    let start = params.start.unwrap_or(0);
     
-    let accounts: Vec<_> = blockchain.accounts.values().cloned().collect();
+    // 残高の降順で取得
+    let accounts = blockchain.get_accounts_by_balance(start as usize, limit as usize);
     
     (StatusCode::OK, Json(ApiResponse::success(accounts)))
 }
 
 async fn create_account(
-    State(state): State<Arc<Mutex<AppState>>>,
+    State(state): State<Arc<AppState>>,
 ) -> (StatusCode, Json<ApiResponse<crate::blockchain::Account>>) {
-    let app_state = state.lock().unwrap();
-    let mut blockchain = app_state.blockchain_state.blockchain.lock().unwrap();
+    let mut blockchain = state.blockchain_state.blockchain.write().unwrap();
     
     let account = blockchain.create_account();
     
@@ -266,11 +351,10 @@ async fn create_account(
 }
 
 async fn get_account_transactions(
-    State(state): State<Arc<Mutex<AppState>>>,
+    State(state): State<Arc<AppState>>,
     Path(address): Path<String>,
 ) -> (StatusCode, Json<ApiResponse<Vec<Transaction>>>) {
-    let app_state = state.lock().unwrap();
-    let blockchain = app_state.blockchain_state.blockchain.lock().unwrap();
+    let blockchain = state.blockchain_state.blockchain.read().unwrap();
     
     let transactions = blockchain.get_account_transactions(&address);
     
@@ -287,19 +371,18 @@ use tokio_tungstenite::tungstenite;
 // WebSocketハンドラー
 async fn ws_handler(
     ws: WebSocketUpgrade,
-    State(state): State<Arc<Mutex<AppState>>>,
+    State(state): State<Arc<AppState>>,
 ) -> Response {
     ws.on_upgrade(|socket| handle_socket(socket, state))
 }
 
-async fn handle_socket(socket: WebSocket, state: Arc<Mutex<AppState>>) {
+async fn handle_socket(socket: WebSocket, state: Arc<AppState>) {
     // ソケットを送信と受信に分割
     let (mut sender, mut receiver) = socket.split();
     
     // 接続時に初期データを送信
     let initial_stats = {
-        let app_state = state.lock().unwrap();
-        let blockchain = app_state.blockchain_state.blockchain.lock().unwrap();
+        let blockchain = state.blockchain_state.blockchain.read().unwrap();
         blockchain.get_network_stats()
     };
     
@@ -321,8 +404,7 @@ async fn handle_socket(socket: WebSocket, state: Arc<Mutex<AppState>>) {
             
             // ネットワーク状態を取得
             let stats = {
-                let app_state = state_clone.lock().unwrap();
-                let blockchain = app_state.blockchain_state.blockchain.lock().unwrap();
+                let blockchain = state_clone.blockchain_state.blockchain.read().unwrap();
                 blockchain.get_network_stats()
             };
             
@@ -339,29 +421,10 @@ async fn handle_socket(socket: WebSocket, state: Arc<Mutex<AppState>>) {
             
             // トランザクション情報も送信
             let transactions = {
-                let app_state = state_clone.lock().unwrap();
-                let blockchain = app_state.blockchain_state.blockchain.lock().unwrap();
-                
-                // すべてのトランザクションを収集
-                let mut all_transactions = Vec::new();
-                
-                // ペンディングトランザクション
-                for tx in &blockchain.pending_transactions {
-                    all_transactions.push(tx.clone());
-                }
-                
-                // 確認済みトランザクション
-                for block in &blockchain.chain {
-                    for tx in &block.transactions {
-                        all_transactions.push(tx.clone());
-                    }
-                }
-                
-                // タイムスタンプの降順でソート
-                all_transactions.sort_by(|a, b| b.timestamp.cmp(&a.timestamp));
+                let blockchain = state_clone.blockchain_state.blockchain.read().unwrap();
                 
                 // 最新の10件を取得
-                all_transactions.into_iter().take(10).collect::<Vec<_>>()
+                blockchain.get_recent_transactions(0, 10)
             };
             
             if let Ok(json) = serde_json::to_string(&ApiResponse::success(transactions)) {
@@ -383,8 +446,7 @@ async fn handle_socket(socket: WebSocket, state: Arc<Mutex<AppState>>) {
                 "get_status" => {
                     // ネットワーク状態を取得して送信
                     let stats = {
-                        let app_state = state.lock().unwrap();
-                        let blockchain = app_state.blockchain_state.blockchain.lock().unwrap();
+                        let blockchain = state.blockchain_state.blockchain.read().unwrap();
                         blockchain.get_network_stats()
                     };
                     
@@ -397,29 +459,10 @@ async fn handle_socket(socket: WebSocket, state: Arc<Mutex<AppState>>) {
                 "get_transactions" => {
                     // 最新のトランザクションを取得して送信
                     let result = {
-                        let app_state = state.lock().unwrap();
-                        let blockchain = app_state.blockchain_state.blockchain.lock().unwrap();
-                        
-                        // すべてのトランザクションを収集
-                        let mut all_transactions = Vec::new();
-                        
-                        // ペンディングトランザクション
-                        for tx in &blockchain.pending_transactions {
-                            all_transactions.push(tx.clone());
-                        }
-                        
-                        // 確認済みトランザクション
-                        for block in &blockchain.chain {
-                            for tx in &block.transactions {
-                                all_transactions.push(tx.clone());
-                            }
-                        }
-                        
-                        // タイムスタンプの降順でソート
-                        all_transactions.sort_by(|a, b| b.timestamp.cmp(&a.timestamp));
+                        let blockchain = state.blockchain_state.blockchain.read().unwrap();
                         
                         // 最新の10件を取得
-                        all_transactions.into_iter().take(10).collect::<Vec<_>>()
+                        blockchain.get_recent_transactions(0, 10)
                     };
                     
                     if let Ok(json) = serde_json::to_string(&ApiResponse::success(result)) {
@@ -444,9 +487,10 @@ pub async fn start_integrated_server(port: u16) -> anyhow::Result<()> {
     let blockchain_state = BlockchainState::new();
     
     // アプリケーション状態の作成
-    let app_state = Arc::new(Mutex::new(AppState {
+    let app_state = Arc::new(AppState {
         blockchain_state,
-    }));
+        tx_cache: Mutex::new(TxJsonCache::default()),
+    });
     
     // 静的ファイルのディレクトリ
     let static_dir = PathBuf::from("./frontend");
@@ -463,6 +507,12 @@ pub async fn start_integrated_server(port: u16) -> anyhow::Result<()> {
     // CORSの設定
     let cors = CorsLayer::permissive();
     
+    // レスポンス圧縮の設定（ハッシュやアドレスを多く含むJSONは圧縮効率が高い）
+    // 小さなレスポンスは圧縮のコストに見合わないため1KB以上のみ対象とする
+    let compression = CompressionLayer::new()
+        .quality(CompressionLevel::Precise(4))
+        .compress_when(DefaultPredicate::new().and(SizeAbove::new(1024)));
+    
     // ルーターの構築
     let app = Router::new()
         // API エンドポイント
@@ -482,6 +532,7 @@ pub async fn start_integrated_server(port: u16) -> anyhow::Result<()> {
         .nest_service("/", static_service.clone())
         .fallback_service(static_service)
         .layer(cors)
+        .layer(compression)
         .layer(TraceLayer::new_for_http())
         .with_state(app_state);
     
@@ -490,8 +541,11 @@ pub async fn start_integrated_server(port: u16) -> anyhow::Result<()> {
     info!("Rustorium integrated server listening on {}", addr);
     println!("Rustorium integrated server listening on {}", addr);
     
+    // 小さなJSONレスポンスが多いため、Nagleアルゴリズムを無効化して遅延を抑える
     let listener = tokio::net::TcpListener::bind(addr).await?;
-    axum::serve(listener, app).await?;
+    axum::serve(listener, app)
+        .tcp_nodelay(true)
+        .await?;
     
     Ok(())
 }
\ No newline at end of file